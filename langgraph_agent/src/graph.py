@@ -4,11 +4,17 @@ from pathlib import Path
 from typing import Any, Dict, List, Literal, TypedDict
 
 from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langgraph.graph import END, StateGraph
 
 from mcp_client import build_mcp_clients, use_mcp
 from mock_tools import fetch_poa, fetch_telemetry, fetch_timestream, select_tools
-from parsing import load_json_file, parse_sqs_event
+from parsing import (
+    coalesce_messages,
+    extract_session_messages,
+    load_json_file,
+    parse_sqs_event,
+)
 
 
 class AgentState(TypedDict, total=False):
@@ -17,6 +23,7 @@ class AgentState(TypedDict, total=False):
     session_id: str
     user_data: Dict[str, Any]
     message_text: str
+    coalesced_count: int
     whatsapp_history: List[Dict[str, str]]
     read_ok: bool
     location_status: Literal["allowed", "denied"]
@@ -35,6 +42,24 @@ class AgentState(TypedDict, total=False):
 ROOT = Path(__file__).resolve().parents[2]
 MOCK_DIR = ROOT / "langgraph_agent" / "data" / "mock"
 
+CLASSIFY_SYSTEM_PROMPT = (
+    "Clasifica el mensaje como COPEC (bencinera) o PRONTO (tienda de conveniencia). "
+    "Responde en JSON con este formato exacto:\n"
+    '{"route":"COPEC|PRONTO","motivo":"breve","formato_agente":"texto"}'
+)
+COPEC_SYSTEM_PROMPT = (
+    "Eres un agente experto de COPEC (bencinera). Responde en español, "
+    "de forma concisa y útil. Inicia con 'Hola desde COPEC'."
+)
+PRONTO_SYSTEM_PROMPT = (
+    "Eres un agente experto de PRONTO (tienda de conveniencia). Responde "
+    "en español, de forma concisa y útil. Inicia con 'Hola desde PRONTO'."
+)
+SYNTHESIZE_SYSTEM_PROMPT = (
+    "Sintetiza la respuesta del agente en un único texto claro y breve. "
+    "Devuelve solo el texto final."
+)
+
 
 def get_llm(mcp_kwargs: Dict[str, Any] | None = None) -> ChatAnthropic:
     model_name = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5-20250929")
@@ -43,6 +68,31 @@ def get_llm(mcp_kwargs: Dict[str, Any] | None = None) -> ChatAnthropic:
     return ChatAnthropic(model=model_name, temperature=0.2)
 
 
+def get_coalesce_window() -> float:
+    raw = os.getenv("WHATSAPP_COALESCE_WINDOW_SECONDS", "10")
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(
+            f"WHATSAPP_COALESCE_WINDOW_SECONDS debe ser numérico, se recibió {raw!r}."
+        ) from exc
+
+
+def _build_messages(system_prompt: str, user_prompt: str) -> List[BaseMessage]:
+    return [
+        SystemMessage(
+            content=[
+                {
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
+        ),
+        HumanMessage(content=user_prompt),
+    ]
+
+
 def _normalize_ubicaciones(raw_ubicaciones: Any) -> List[Any]:
     if raw_ubicaciones is None:
         return []
@@ -96,6 +146,14 @@ def parse_event(state: AgentState) -> Dict[str, Any]:
     return {"session_id": session_id, "user_data": user_data, "message_text": message_text}
 
 
+def coalesce_session_messages(state: AgentState) -> Dict[str, Any]:
+    messages = extract_session_messages(state["raw_event"], state["session_id"])
+    burst = coalesce_messages(messages, get_coalesce_window())
+    if len(burst) <= 1:
+        return {"coalesced_count": 1}
+    return {"message_text": "\n".join(burst), "coalesced_count": len(burst)}
+
+
 def load_whatsapp_history(state: AgentState) -> Dict[str, Any]:
     history = _load_history("conversaciones_whatsapp.json", state["session_id"])
     return {"whatsapp_history": history}
@@ -131,13 +189,8 @@ def validate_question(state: AgentState) -> Dict[str, Any]:
 
 def classify_message(state: AgentState) -> Dict[str, Any]:
     llm = get_llm()
-    prompt = (
-        "Clasifica el mensaje como COPEC (bencinera) o PRONTO (tienda de conveniencia). "
-        "Responde en JSON con este formato exacto:\n"
-        '{"route":"COPEC|PRONTO","motivo":"breve","formato_agente":"texto"}\n'
-        f"Mensaje: {state['message_text']}"
-    )
-    response = llm.invoke(prompt)
+    prompt = f"Mensaje: {state['message_text']}"
+    response = llm.invoke(_build_messages(CLASSIFY_SYSTEM_PROMPT, prompt))
     content = str(response.content).strip()
     try:
         parsed = json.loads(content)
@@ -177,13 +230,11 @@ def call_tools(state: AgentState) -> Dict[str, Any]:
 def copec_agent(state: AgentState) -> Dict[str, Any]:
     llm = get_llm(_build_mcp_kwargs(state))
     prompt = (
-        "Eres un agente experto de COPEC (bencinera). Responde en español, "
-        "de forma concisa y útil. Inicia con 'Hola desde COPEC'.\n"
         f"Mensaje: {state['message_text']}\n"
         f"Historial: {state.get('agent_history', [])}\n"
         f"Datos: {state.get('tool_results', {})}"
     )
-    response = llm.invoke(prompt)
+    response = llm.invoke(_build_messages(COPEC_SYSTEM_PROMPT, prompt))
     reply = str(response.content)
     return {"agent_reply": reply}
 
@@ -191,13 +242,11 @@ def copec_agent(state: AgentState) -> Dict[str, Any]:
 def pronto_agent(state: AgentState) -> Dict[str, Any]:
     llm = get_llm()
     prompt = (
-        "Eres un agente experto de PRONTO (tienda de conveniencia). Responde "
-        "en español, de forma concisa y útil. Inicia con 'Hola desde PRONTO'.\n"
         f"Mensaje: {state['message_text']}\n"
         f"Historial: {state.get('agent_history', [])}\n"
         f"Datos: {state.get('tool_results', {})}"
     )
-    response = llm.invoke(prompt)
+    response = llm.invoke(_build_messages(PRONTO_SYSTEM_PROMPT, prompt))
     reply = str(response.content)
     return {"agent_reply": reply}
 
@@ -216,12 +265,8 @@ def save_agent_history(state: AgentState) -> Dict[str, Any]:
 
 def synthesize(state: AgentState) -> Dict[str, Any]:
     llm = get_llm()
-    prompt = (
-        "Sintetiza la respuesta del agente en un único texto claro y breve. "
-        "Devuelve solo el texto final.\n"
-        f"Respuesta: {state['agent_reply']}"
-    )
-    response = llm.invoke(prompt)
+    prompt = f"Respuesta: {state['agent_reply']}"
+    response = llm.invoke(_build_messages(SYNTHESIZE_SYSTEM_PROMPT, prompt))
     return {"synthesized_reply": str(response.content)}
 
 
@@ -229,6 +274,7 @@ def evaluate(state: AgentState) -> Dict[str, Any]:
     evaluation = {
         "ok": bool(state.get("synthesized_reply")),
         "route": state.get("route"),
+        "coalesced_count": state.get("coalesced_count", 1),
     }
     return {"evaluation": evaluation}
 
@@ -261,6 +307,7 @@ def build_graph():
     graph = StateGraph(AgentState)
     graph.add_node("load_event", load_event)
     graph.add_node("parse_event", parse_event)
+    graph.add_node("coalesce_session_messages", coalesce_session_messages)
     graph.add_node("load_whatsapp_history", load_whatsapp_history)
     graph.add_node("read_message", read_message)
     graph.add_node("validate_locations", validate_locations)
@@ -279,7 +326,8 @@ def build_graph():
 
     graph.set_entry_point("load_event")
     graph.add_edge("load_event", "parse_event")
-    graph.add_edge("parse_event", "load_whatsapp_history")
+    graph.add_edge("parse_event", "coalesce_session_messages")
+    graph.add_edge("coalesce_session_messages", "load_whatsapp_history")
     graph.add_edge("load_whatsapp_history", "read_message")
     graph.add_edge("read_message", "validate_locations")
     graph.add_conditional_edges(
@@ -1,5 +1,5 @@
 import json
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 
 def load_json_file(path: str) -> Dict[str, Any]:
@@ -7,46 +7,144 @@ def load_json_file(path: str) -> Dict[str, Any]:
         return json.load(handle)
 
 
+def _load_record_payload(record: Dict[str, Any], index: int) -> Dict[str, Any]:
+    record_body = record.get("body")
+    if not record_body:
+        raise ValueError(f"Records[{index}].body está vacío o no existe.")
+
+    payload = json.loads(record_body)
+    if not isinstance(payload, dict):
+        raise ValueError(f"Records[{index}].body no es un objeto JSON.")
+    return payload
+
+
 def _load_outer_payload(sqs_event: Dict[str, Any]) -> Dict[str, Any]:
     records = sqs_event.get("Records") or []
     if not records:
         raise ValueError("El evento SQS no contiene Records.")
 
-    record_body = records[0].get("body")
-    if not record_body:
-        raise ValueError("Records[0].body está vacío o no existe.")
-
-    return json.loads(record_body)
+    return _load_record_payload(records[0], 0)
 
 
 def _load_inner_payload(outer_payload: Dict[str, Any]) -> Dict[str, Any]:
-    event_payload = outer_payload.get("event", {})
+    event_payload = outer_payload.get("event")
+    if not isinstance(event_payload, dict):
+        event_payload = {}
     inner_body = event_payload.get("body") or outer_payload.get("body")
     if not inner_body:
         raise ValueError("No se encontró 'body' interno en el payload.")
 
     if isinstance(inner_body, str):
-        return json.loads(inner_body)
+        inner_body = json.loads(inner_body)
     if isinstance(inner_body, dict):
         return inner_body
     raise ValueError("El 'body' interno tiene un tipo no soportado.")
 
 
-def extract_whatsapp_text(sqs_event: Dict[str, Any]) -> str:
-    outer_payload = _load_outer_payload(sqs_event)
-    inner_payload = _load_inner_payload(outer_payload)
+def _first_message(inner_payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        message = inner_payload["entry"][0]["changes"][0]["value"]["messages"][0]
+    except Exception as exc:
+        raise ValueError(
+            "No se encontró el mensaje de WhatsApp en el payload."
+        ) from exc
+    if not isinstance(message, dict):
+        raise ValueError("El mensaje de WhatsApp no es un objeto JSON.")
+    return message
+
+
+def _extract_message_text(message: Dict[str, Any]) -> str:
     try:
-        return (
-            inner_payload["entry"][0]["changes"][0]["value"]["messages"][0]["text"][
-                "body"
-            ]
-        )
+        return message["text"]["body"]
     except Exception as exc:
         raise ValueError(
             "No se pudo extraer el texto del mensaje de WhatsApp."
         ) from exc
 
 
+def _extract_message_timestamp(
+    record: Dict[str, Any], message: Dict[str, Any]
+) -> float | None:
+    attributes = record.get("attributes")
+    sent_timestamp = (
+        attributes.get("SentTimestamp") if isinstance(attributes, dict) else None
+    )
+    try:
+        if sent_timestamp:
+            return int(sent_timestamp) / 1000
+        return float(message["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def extract_whatsapp_text(sqs_event: Dict[str, Any]) -> str:
+    outer_payload = _load_outer_payload(sqs_event)
+    inner_payload = _load_inner_payload(outer_payload)
+    return _extract_message_text(_first_message(inner_payload))
+
+
+def extract_session_messages(
+    sqs_event: Dict[str, Any], session_id: str
+) -> List[Tuple[float | None, str]]:
+    messages: List[Tuple[float | None, str]] = []
+    seen_ids = set()
+    for index, record in enumerate(sqs_event.get("Records") or []):
+        if not isinstance(record, dict):
+            continue
+        try:
+            outer_payload = _load_record_payload(record, index)
+        except ValueError:
+            continue
+        if (outer_payload.get("session_id") or "unknown-session") != session_id:
+            continue
+        try:
+            message = _first_message(_load_inner_payload(outer_payload))
+            text = _extract_message_text(message)
+        except ValueError:
+            continue
+        message_id = message.get("id") or record.get("messageId")
+        if message_id:
+            if message_id in seen_ids:
+                continue
+            seen_ids.add(message_id)
+        messages.append((_extract_message_timestamp(record, message), text))
+    return messages
+
+
+def coalesce_messages(
+    messages: List[Tuple[float | None, str]], window_seconds: float
+) -> List[str]:
+    # messages viene en orden de Records; messages[0] es el mensaje que tomó
+    # parse_event y ancla la ráfaga, que se extiende hacia ambos lados.
+    if not messages:
+        return []
+    anchor_timestamp, anchor_text = messages[0]
+    if window_seconds <= 0:
+        return [anchor_text]
+
+    untimed = [text for timestamp, text in messages[1:] if timestamp is None]
+    if anchor_timestamp is None:
+        return [anchor_text, *untimed]
+
+    timed = sorted(
+        (timestamp, index, text)
+        for index, (timestamp, text) in enumerate(messages)
+        if timestamp is not None
+    )
+    anchor_position = next(
+        position for position, item in enumerate(timed) if item[1] == 0
+    )
+    start = anchor_position
+    while start > 0 and timed[start][0] - timed[start - 1][0] <= window_seconds:
+        start -= 1
+    end = anchor_position
+    while (
+        end < len(timed) - 1 and timed[end + 1][0] - timed[end][0] <= window_seconds
+    ):
+        end += 1
+    return [text for _, _, text in timed[start : end + 1]] + untimed
+
+
 def parse_sqs_event(sqs_event: Dict[str, Any]) -> Tuple[str, Dict[str, Any], str]:
     outer_payload = _load_outer_payload(sqs_event)
     session_id = outer_payload.get("session_id") or "unknown-session"
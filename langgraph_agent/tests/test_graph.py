@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+from typing import Any, List
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import graph  # noqa: E402
+from langchain_core.messages import HumanMessage, SystemMessage  # noqa: E402
+from parsing import load_json_file  # noqa: E402
+
+
+DEBUG_DIR = ROOT / "data" / "debug"
+
+
+class _StubResponse:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+class _StubChatAnthropic:
+    calls: List[List[Any]] = []
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.kwargs = kwargs
+
+    def invoke(self, messages: List[Any]) -> _StubResponse:
+        _StubChatAnthropic.calls.append(messages)
+        return _StubResponse('{"route":"PRONTO","motivo":"test","formato_agente":"texto"}')
+
+
+def _coalesce(event_file: str, monkeypatch) -> dict:
+    monkeypatch.setenv("WHATSAPP_COALESCE_WINDOW_SECONDS", "10")
+    raw_event = load_json_file(str(DEBUG_DIR / event_file))
+    session_id, _, message_text = graph.parse_sqs_event(raw_event)
+    return graph.coalesce_session_messages(
+        {"raw_event": raw_event, "session_id": session_id, "message_text": message_text}
+    )
+
+
+def test_coalesce_session_messages_merges_fragments(monkeypatch):
+    assert _coalesce("sqs_event_fragments.json", monkeypatch) == {
+        "message_text": "Hola\nnecesito las ventas de hoy\nde productos no combustibles",
+        "coalesced_count": 3,
+    }
+
+
+def test_coalesce_session_messages_single_record(monkeypatch):
+    assert _coalesce("sqs_event.json", monkeypatch) == {"coalesced_count": 1}
+
+
+def test_classify_message_keeps_static_system_block(monkeypatch):
+    monkeypatch.setattr(graph, "ChatAnthropic", _StubChatAnthropic)
+    _StubChatAnthropic.calls = []
+
+    first = graph.classify_message({"message_text": "Quiero un café y un sandwich"})
+    graph.classify_message({"message_text": "Precio de la bencina 95"})
+
+    assert first["route"] == "PRONTO"
+    system_blocks = []
+    for messages in _StubChatAnthropic.calls:
+        system, human = messages
+        assert isinstance(system, SystemMessage)
+        assert isinstance(human, HumanMessage)
+        assert system.content == [
+            {
+                "type": "text",
+                "text": graph.CLASSIFY_SYSTEM_PROMPT,
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        system_blocks.append(system.content[0]["text"].encode("utf-8"))
+    assert system_blocks[0] == system_blocks[1]
+    assert _StubChatAnthropic.calls[0][1].content == "Mensaje: Quiero un café y un sandwich"
+    assert _StubChatAnthropic.calls[1][1].content == "Mensaje: Precio de la bencina 95"
@@ -0,0 +1,93 @@
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from parsing import coalesce_messages, extract_session_messages  # noqa: E402
+
+
+def _record(session_id: str, message: Dict[str, Any], sent_ms: int | None = None) -> Dict[str, Any]:
+    body = {
+        "event": {"body": {"entry": [{"changes": [{"value": {"messages": [message]}}]}]}},
+        "session_id": session_id,
+    }
+    record: Dict[str, Any] = {"body": json.dumps(body)}
+    if sent_ms is not None:
+        record["attributes"] = {"SentTimestamp": str(sent_ms)}
+    return record
+
+
+def _text(body: str) -> Dict[str, Any]:
+    return {"type": "text", "text": {"body": body}}
+
+
+def test_coalesce_window_disabled_returns_anchor():
+    messages = [(100.0, "R0"), (101.0, "a")]
+    assert coalesce_messages(messages, 0) == ["R0"]
+    assert coalesce_messages(messages, -5) == ["R0"]
+
+
+def test_coalesce_out_of_order_anchor_is_kept():
+    messages = [(100.0, "R0"), (50.0, "a"), (55.0, "b")]
+    assert coalesce_messages(messages, 10) == ["R0"]
+
+
+def test_coalesce_extends_both_directions_from_anchor():
+    messages = [(100.0, "R0"), (95.0, "a"), (104.0, "b"), (200.0, "c")]
+    assert coalesce_messages(messages, 10) == ["a", "R0", "b"]
+
+
+def test_coalesce_gap_larger_than_window_breaks_burst():
+    messages = [(1.0, "R0"), (4.0, "a"), (60.0, "b")]
+    assert coalesce_messages(messages, 10) == ["R0", "a"]
+
+
+def test_coalesce_missing_timestamp_goes_after_timed_records():
+    messages = [(100.0, "R0"), (None, "a"), (103.0, "b")]
+    assert coalesce_messages(messages, 10) == ["R0", "b", "a"]
+
+
+def test_coalesce_untimed_anchor_keeps_record_order():
+    messages = [(None, "R0"), (5.0, "a"), (None, "b")]
+    assert coalesce_messages(messages, 10) == ["R0", "b"]
+
+
+def test_extract_session_messages_skips_unusable_records():
+    event = {
+        "Records": [
+            _record("session-123", _text("Hola"), 1000),
+            _record("session-123", {"type": "image", "image": {"id": "img-1"}}, 2000),
+            {"body": ""},
+            {"body": "{no es json"},
+            {"body": "[1]"},
+            {"body": "null"},
+            {"body": json.dumps({"session_id": "session-123", "event": {"body": "[1]"}})},
+            _record("session-123", "no es un objeto", 2200),
+            _record("session-999", _text("otra sesión"), 2500),
+            _record("session-123", _text("ventas de hoy"), 3000),
+        ]
+    }
+    assert extract_session_messages(event, "session-123") == [
+        (1.0, "Hola"),
+        (3.0, "ventas de hoy"),
+    ]
+
+
+def test_extract_session_messages_drops_redelivered_messages():
+    first = _record("session-123", dict(_text("Hola"), id="wamid.1"), 1000)
+    event = {
+        "Records": [
+            dict(first, messageId="sqs-1"),
+            dict(first, messageId="sqs-2"),
+            dict(_record("session-123", _text("ventas"), 2000), messageId="sqs-3"),
+            dict(_record("session-123", _text("ventas"), 2000), messageId="sqs-3"),
+        ]
+    }
+    assert extract_session_messages(event, "session-123") == [
+        (1.0, "Hola"),
+        (2.0, "ventas"),
+    ]
@@ -33,6 +33,14 @@ def main() -> None:
         "--model",
         help="Modelo Anthropic (sobrescribe ANTHROPIC_MODEL).",
     )
+    parser.add_argument(
+        "--coalesce-window",
+        type=float,
+        help=(
+            "Segundos para agrupar mensajes seguidos de la misma sesión "
+            "(sobrescribe WHATSAPP_COALESCE_WINDOW_SECONDS)."
+        ),
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -48,6 +56,8 @@ def main() -> None:
         os.environ["ANTHROPIC_API_KEY"] = args.api_key
     if args.model:
         os.environ["ANTHROPIC_MODEL"] = args.model
+    if args.coalesce_window is not None:
+        os.environ["WHATSAPP_COALESCE_WINDOW_SECONDS"] = str(args.coalesce_window)
 
     result = run_graph(args.input, debug=args.debug, debug_output=args.debug_out)
     print(result)